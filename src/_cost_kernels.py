@@ -0,0 +1,86 @@
+import numpy as np
+from numba import njit
+
+@njit(cache=True, fastmath=True)
+def temp_impact_kernel(size, volume, volatility, price, gamma, alpha):
+    if size == 0.0 or volume == 0.0:
+        return 0.0
+    abs_size = abs(size)
+    return gamma * (abs_size / volume) ** alpha * volatility * price * abs_size
+
+@njit(cache=True, fastmath=True)
+def perm_impact_kernel(total_size, daily_volume, price, eta, beta):
+    if total_size == 0.0 or daily_volume == 0.0:
+        return 0.0
+    abs_total = abs(total_size)
+    return eta * (abs_total / daily_volume) ** beta * price * abs_total
+
+@njit(cache=True, fastmath=True)
+def temp_impact_decay_kernel(sizes, volumes, vols, prices, gamma, alpha, decay_weights):
+    # Temporary impact of every period, weighted by its average decay over the remaining horizon
+    total = 0.0
+    for t in range(sizes.shape[0]):
+        total += temp_impact_kernel(sizes[t], volumes[t], vols[t], prices[t], gamma, alpha) * decay_weights[t]
+    return total
+
+# Running totals kept by accumulate_costs, in this order
+N_COST_ACCUMULATORS = 6  # spread cost, temporary impact, net shares, |shares|, quote notional, volume
+
+@njit(cache=True, fastmath=True)
+def accumulate_costs(acc, n_t, spread, bid, ask, mid, volume, volatility,
+                     temp_gamma, temp_alpha, decay_weight):
+    # Folds one period's trade and quotes into the running totals in acc
+    abs_n = abs(n_t)
+    acc[2] += n_t
+    # Daily volume for permanent impact; mean(volume) * T is simply the summed volume
+    acc[5] += volume
+    
+    if n_t == 0.0:
+        return
+    
+    acc[0] += 0.5 * spread * abs_n
+    
+    # Buys fill at the ask, sells at the bid
+    if n_t > 0:
+        acc[4] += ask * abs_n
+    else:
+        acc[4] += bid * abs_n
+    acc[3] += abs_n
+    
+    inst_impact = temp_impact_kernel(abs_n, volume, volatility, mid, temp_gamma, temp_alpha)
+    acc[1] += inst_impact * decay_weight
+
+@njit(cache=True, fastmath=True)
+def finalize_costs(acc, final_price, arrival_price, perm_eta, perm_beta):
+    spread_cost, temp_impact, total_shares, total_abs, quote_notional, daily_volume = (
+        acc[0], acc[1], acc[2], acc[3], acc[4], acc[5])
+    
+    perm_impact = perm_impact_kernel(total_shares, daily_volume, arrival_price, perm_eta, perm_beta)
+    
+    vwap = quote_notional / total_abs if total_abs > 0 else arrival_price
+    
+    #Implementation Shortfall (opportunity cost)
+    opportunity_cost = max(0.0, (vwap - arrival_price) * total_shares)
+    
+    post_trade_drift = (final_price - vwap) * total_shares
+    
+    # For a buy the adverse selection is negative drift 
+    if total_shares > 0:
+        adverse_selection = max(0.0, -post_trade_drift)
+    else:
+        adverse_selection = max(0.0, post_trade_drift)
+    
+    return spread_cost, temp_impact, perm_impact, opportunity_cost, adverse_selection
+
+@njit(cache=True, fastmath=True)
+def compute_costs_kernel(sizes, spreads, bids, asks, mids, volumes, vols, arrival_price,
+                         temp_gamma, temp_alpha, perm_eta, perm_beta, decay_weights):
+    T = sizes.shape[0]
+    acc = np.zeros(N_COST_ACCUMULATORS)
+    
+    for t in range(T):
+        accumulate_costs(acc, sizes[t], spreads[t], bids[t], asks[t], mids[t], volumes[t], vols[t],
+                         temp_gamma, temp_alpha, decay_weights[t])
+    
+    final_price = mids[T - 1] if T > 0 else arrival_price
+    return finalize_costs(acc, final_price, arrival_price, perm_eta, perm_beta)
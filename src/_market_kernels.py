@@ -0,0 +1,113 @@
+import math
+import numpy as np
+from numba import njit
+from src._cost_kernels import N_COST_ACCUMULATORS, accumulate_costs, finalize_costs
+
+@njit(cache=True, fastmath=True)
+def heston_price_step(v, price, kappa_v, theta_v, sigma_v, kappa_p, theta_p, inv_vol_per_minute, dt,
+                      dW_v, dW_p, ext_size, expected_volume, base_spread, base_depth,
+                      vol_multiplier, drift_rate, impact_gamma, impact_alpha):
+    # Heston variance update
+    v_plus = max(v, 0.0)
+    dv = kappa_v * (theta_v - v_plus) * dt + sigma_v * math.sqrt(v_plus) * dW_v
+    v = max(v + dv, 0.0)
+    current_vol = math.sqrt(v) * vol_multiplier
+    
+    # Mean-reverting mid price plus any momentum drift
+    drift = drift_rate * price * dt
+    price += kappa_p * (theta_p - price) * dt + current_vol * price * dW_p + drift
+    
+    participation = abs(ext_size) / max(expected_volume, 1.0)
+    spread = base_spread * (1 + 1.5 * current_vol * inv_vol_per_minute)
+    if ext_size != 0.0:
+        impact = impact_gamma * (participation ** impact_alpha) * current_vol * price
+        price += impact if ext_size > 0 else -impact
+        spread *= (1 + 0.5 * participation)
+    
+    depth = base_depth / (1 + 0.5 * participation)
+    
+    return v, price, spread, depth, current_vol
+
+# Length of the step_params tuple unpacked by path_step
+N_STEP_PARAMS = 11
+
+@njit(cache=True)
+def path_step(t, v, price, trajectory, dW, expected_volume, base_spread, vol_multiplier, step_params):
+    # Minute t of a path: heston_price_step fed from the per-minute inputs. step_params holds
+    # (kappa_v, theta_v, sigma_v, kappa_p, theta_p, inv_vol_per_minute, dt, base_depth,
+    #  drift_rate, impact_gamma, impact_alpha) as built by MarketSimulator._step_params.
+    (kappa_v, theta_v, sigma_v, kappa_p, theta_p, inv_vol_per_minute, dt, base_depth,
+     drift_rate, impact_gamma, impact_alpha) = step_params
+    return heston_price_step(
+        v, price, kappa_v, theta_v, sigma_v, kappa_p, theta_p, inv_vol_per_minute, dt,
+        dW[t, 0], dW[t, 1], trajectory[t], expected_volume[t], base_spread[t], base_depth,
+        vol_multiplier[t], drift_rate, impact_gamma, impact_alpha
+    )
+
+@njit(cache=True)
+def simulate_path_kernel(trajectory, dW, v, price, expected_volume, base_spread, vol_multiplier,
+                         step_params):
+    # Runs path_step over a whole trajectory. dW is (T, 2) scaled Brownian increments;
+    # expected_volume, base_spread and vol_multiplier are per-minute arrays. v and price stay
+    # float64 throughout; apart from the mid price the per-minute history is written out as float32.
+    T = trajectory.shape[0]
+    mids = np.empty(T)
+    spreads = np.empty(T, dtype=np.float32)
+    depths = np.empty(T, dtype=np.float32)
+    vols = np.empty(T, dtype=np.float32)
+    
+    for t in range(T):
+        v, price, spread, depth, current_vol = path_step(
+            t, v, price, trajectory, dW, expected_volume, base_spread, vol_multiplier, step_params)
+        mids[t] = price
+        spreads[t] = spread
+        depths[t] = depth
+        vols[t] = current_vol
+    
+    return v, price, mids, spreads, depths, vols
+
+@njit(cache=True)
+def simulate_path_costs_kernel(trajectory, dW, v, price, expected_volume, base_spread, vol_multiplier,
+                               step_params, arrival_price, temp_gamma, temp_alpha, perm_eta, perm_beta,
+                               decay_weights):
+    # simulate_path_kernel with the cost accumulation folded into the minute loop, so no
+    # per-minute history is stored. Everything stays in float64; compute_costs_kernel on a
+    # stored path sees float32 spread, volume and volatility, so the two agree to ~1e-7 relative.
+    T = trajectory.shape[0]
+    acc = np.zeros(N_COST_ACCUMULATORS)
+    
+    for t in range(T):
+        v, price, spread, depth, current_vol = path_step(
+            t, v, price, trajectory, dW, expected_volume, base_spread, vol_multiplier, step_params)
+        bid = price - spread / 2
+        ask = price + spread / 2
+        accumulate_costs(acc, trajectory[t], spread, bid, ask, price, expected_volume[t],
+                         current_vol, temp_gamma, temp_alpha, decay_weights[t])
+    
+    final_price = price if T > 0 else arrival_price
+    costs = finalize_costs(acc, final_price, arrival_price, perm_eta, perm_beta)
+    return v, price, costs
+
+@njit(cache=True)
+def simulate_costs_batch_kernel(trajectory, dW, v, price, expected_volume, base_spread, vol_multiplier,
+                                step_params, arrival_prices, temp_gamma, temp_alpha, perm_eta, perm_beta,
+                                decay_weights):
+    # simulate_path_costs_kernel for many simulations of one trajectory. Every input except the
+    # trajectory and decay weights has a leading simulation axis; step_params is (n_sims, 11).
+    # Returns one row of cost components per simulation, in CostBreakdown field order.
+    n_sims = dW.shape[0]
+    out = np.empty((n_sims, 5))
+    for i in range(n_sims):
+        p = step_params[i]
+        _, _, costs = simulate_path_costs_kernel(
+            trajectory, dW[i], v[i], price[i], expected_volume[i], base_spread[i], vol_multiplier[i],
+            (p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7], p[8], p[9], p[10]),
+            arrival_prices[i], temp_gamma, temp_alpha, perm_eta, perm_beta, decay_weights
+        )
+        spread, temp, perm, opp, adverse = costs
+        out[i, 0] = spread
+        out[i, 1] = temp
+        out[i, 2] = perm
+        out[i, 3] = opp
+        out[i, 4] = adverse
+    return out
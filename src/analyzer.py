@@ -1,60 +1,78 @@
+import sys
 import numpy as np
 import pandas as pd
+import matplotlib
+
+# Batch runs (redirected stdout, no notebook kernel) render off-screen and skip plt.show()
+INTERACTIVE = sys.stdout.isatty() or 'ipykernel' in sys.modules
+if not INTERACTIVE:
+    matplotlib.use('Agg')
+
 import matplotlib.pyplot as plt
+from functools import lru_cache
 from typing import Dict
 from src.data_structures import MonteCarloResults
 
+@lru_cache(maxsize=16)
+def _palette(name: str, n: int, start: float = 0.0, stop: float = 1.0) -> np.ndarray:
+    colors = plt.get_cmap(name)(np.linspace(start, stop, n))
+    colors.flags.writeable = False
+    return colors
+
 class MonteCarloAnalyzer:
+    @staticmethod
+    def _column(mc_results: Dict[str, MonteCarloResults], attr: str, dtype=np.float64) -> np.ndarray:
+        return np.fromiter((getattr(r, attr) for r in mc_results.values()),
+                           dtype=dtype, count=len(mc_results))
+    
     @staticmethod
     def create_summary_table(mc_results: Dict[str, MonteCarloResults]) -> pd.DataFrame:
-        rows = []
-        
-        for name, result in mc_results.items():
-            rows.append({
-                'Strategy': name,
-                'Mean (bp)': result.mean_cost,
-                'Std (bp)': result.std_cost,
-                'Median (bp)': result.median_cost,
-                '5th Pct (bp)': result.percentile_5,
-                '95th Pct (bp)': result.percentile_95,
-                'VaR 95% (bp)': result.value_at_risk_95,
-                'Risk-Adjusted Savings': result.risk_adjusted_savings,
-                'N Sims': result.n_simulations
-            })
-        
-        return pd.DataFrame(rows)
+        col = MonteCarloAnalyzer._column
+        
+        return pd.DataFrame({
+            'Strategy': list(mc_results),
+            'Mean (bp)': col(mc_results, 'mean_cost'),
+            'Std (bp)': col(mc_results, 'std_cost'),
+            'Median (bp)': col(mc_results, 'median_cost'),
+            '5th Pct (bp)': col(mc_results, 'percentile_5'),
+            '95th Pct (bp)': col(mc_results, 'percentile_95'),
+            'VaR 95% (bp)': col(mc_results, 'value_at_risk_95'),
+            'Risk-Adjusted Savings': col(mc_results, 'risk_adjusted_savings'),
+            'N Sims': col(mc_results, 'n_simulations', np.int64)
+        })
     
     @staticmethod
     def create_component_table(mc_results: Dict[str, MonteCarloResults]) -> pd.DataFrame:
-        rows = []
-        
-        for name, result in mc_results.items():
-            rows.append({
-                'Strategy': name,
-                'Spread (bp)': result.mean_spread,
-                'Temp Impact (bp)': result.mean_temp_impact,
-                'Perm Impact (bp)': result.mean_perm_impact,
-                'Impl Shortfall (bp)': result.mean_opportunity,
-                'Adverse Sel (bp)': result.mean_adverse,
-                'Total (bp)': result.mean_cost
-            })
-        
-        return pd.DataFrame(rows)
+        col = MonteCarloAnalyzer._column
+        
+        return pd.DataFrame({
+            'Strategy': list(mc_results),
+            'Spread (bp)': col(mc_results, 'mean_spread'),
+            'Temp Impact (bp)': col(mc_results, 'mean_temp_impact'),
+            'Perm Impact (bp)': col(mc_results, 'mean_perm_impact'),
+            'Impl Shortfall (bp)': col(mc_results, 'mean_opportunity'),
+            'Adverse Sel (bp)': col(mc_results, 'mean_adverse'),
+            'Total (bp)': col(mc_results, 'mean_cost')
+        })
     
     @staticmethod
     def plot_distributions(mc_results: Dict[str, MonteCarloResults], save_path: str = None):
         fig, axes = plt.subplots(2, 1, figsize=(12, 10))
         
+        data_for_box = []
         data_for_violin = []
         labels = []
         for name, result in mc_results.items():
-            data_for_violin.append(result.costs_bps)
+            costs = result.costs_bps
+            data_for_box.append(costs)
+            # The violin KDE only needs a subsample to recover the shape of the distribution
+            data_for_violin.append(np.random.choice(costs, size=min(300, len(costs)), replace=False))
             labels.append(name)
         
         parts = axes[0].violinplot(data_for_violin, positions=range(len(labels)), 
                                     showmeans=True, showmedians=True, widths=0.7)
         
-        colors = plt.cm.Set3(np.linspace(0, 1, len(labels)))
+        colors = _palette('Set3', len(labels))
         for i, pc in enumerate(parts['bodies']):
             pc.set_facecolor(colors[i])
             pc.set_alpha(0.7)
@@ -65,7 +83,7 @@ class MonteCarloAnalyzer:
         axes[0].set_title('Cost Distribution by Strategy (Violin Plot)', fontsize=12, fontweight='bold')
         axes[0].grid(axis='y', alpha=0.3)
         
-        bp = axes[1].boxplot(data_for_violin, labels=labels, patch_artist=True, showfliers=False)
+        bp = axes[1].boxplot(data_for_box, labels=labels, patch_artist=True, showfliers=False)
         
         for i, patch in enumerate(bp['boxes']):
             patch.set_facecolor(colors[i])
@@ -89,7 +107,8 @@ class MonteCarloAnalyzer:
         
         if save_path:
             plt.savefig(save_path, dpi=150, bbox_inches='tight')
-        plt.show()
+        if INTERACTIVE:
+            plt.show()
         plt.close(fig)
         
         return fig
@@ -102,21 +121,19 @@ class MonteCarloAnalyzer:
         
         x = np.arange(len(strategies))
         
-        component_data = {
-            'Spread': [mc_results[s].mean_spread for s in strategies],
-            'Temp Impact': [mc_results[s].mean_temp_impact for s in strategies],
-            'Perm Impact': [mc_results[s].mean_perm_impact for s in strategies],
-            'Impl Shortfall': [mc_results[s].mean_opportunity for s in strategies],
-            'Adverse Sel': [mc_results[s].mean_adverse for s in strategies],
-        }
+        components = ['Spread', 'Temp Impact', 'Perm Impact', 'Impl Shortfall', 'Adverse Sel']
         
-        bottom = np.zeros(len(strategies))
-        colors = plt.cm.Set2(np.linspace(0, 1, len(component_data)))
+        # Rows are components, columns are strategies
+        component_matrix = np.array([
+            [r.mean_spread, r.mean_temp_impact, r.mean_perm_impact, r.mean_opportunity, r.mean_adverse]
+            for r in mc_results.values()
+        ]).T
+        bottoms = np.vstack([np.zeros(len(strategies)), np.cumsum(component_matrix, axis=0)[:-1]])
+        colors = _palette('Set2', len(components))
         
-        for i, (comp, values) in enumerate(component_data.items()):
-            ax.bar(x, values, width=0.7, bottom=bottom, label=comp, 
+        for i, comp in enumerate(components):
+            ax.bar(x, component_matrix[i], width=0.7, bottom=bottoms[i], label=comp, 
                    color=colors[i], alpha=0.8, edgecolor='black', linewidth=0.5)
-            bottom += values
         
         total_means = [mc_results[s].mean_cost for s in strategies]
         ci_lower = [mc_results[s].percentile_5 for s in strategies]
@@ -154,10 +171,13 @@ class MonteCarloAnalyzer:
         bars = ax.bar(x, means, yerr=stds, capsize=10, alpha=0.7, 
                       edgecolor='black', linewidth=1.5, error_kw={'linewidth': 2})
         
-        colors = plt.cm.RdYlGn_r(np.linspace(0.3, 0.9, len(strategies)))
+        colors = _palette('RdYlGn_r', len(strategies), 0.3, 0.9)
         sorted_indices = np.argsort(means)
+        # Invert the sort permutation: ranks[i] is bar i's position from cheapest to dearest
+        ranks = np.empty_like(sorted_indices)
+        ranks[sorted_indices] = np.arange(len(sorted_indices))
         for i, bar in enumerate(bars):
-            bar.set_color(colors[np.where(sorted_indices == i)[0][0]])
+            bar.set_color(colors[ranks[i]])
         
         ax.set_ylabel('Mean Cost (basis points)', fontsize=11)
         ax.set_xlabel('Strategy', fontsize=11)
@@ -277,11 +297,9 @@ class MonteCarloAnalyzer:
         
         for name, result in mc_results.items():
 
-            if result.all_results:
-                trajectories = [r.trajectory for r in result.all_results]
-                T = len(trajectories[0])
-                avg_trajectory = np.mean(trajectories, axis=0)
-                std_trajectory = np.std(trajectories, axis=0)
+            if len(result.trajectories):
+                T = result.trajectories.shape[1]
+                avg_trajectory = result.trajectories.mean(axis=0)
                 
                 #normalize to cumulative percentage
                 cumsum = np.cumsum(avg_trajectory)
@@ -7,6 +7,8 @@ class MonteCarloConfig:
     
     n_simulations = 1000  
     n_simulations_quick = 300
+    n_jobs = -1  # joblib workers, -1 uses every core
+    retain_full_results = False  # keep every ExecutionResult (with market states) in MonteCarloResults
     
     base_price = 100.0
     base_vol = 0.02  
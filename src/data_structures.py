@@ -1,6 +1,12 @@
+import numpy as np
 from dataclasses import dataclass, field
 from typing import List, Tuple, Dict, Optional
 
+# Storage precision for per-period market paths other than time and mid price. Prices and
+# variance are evolved in float64; only the stored history is narrowed, and costs are
+# accumulated in float64.
+PATH_DTYPE = np.float32
+
 @dataclass
 class MarketState:
     time: float
@@ -17,6 +23,73 @@ class MarketState:
     def spread(self):
         return self.ask - self.bid
 
+@dataclass
+class MarketStatesSoA:
+    # One contiguous array per MarketState field, indexed by period. Quotes are kept as mid
+    # and spread: float32 bid/ask near the price would cancel most of the spread's digits.
+    time: np.ndarray
+    mid_price: np.ndarray
+    spread: np.ndarray
+    bid_depth: np.ndarray
+    ask_depth: np.ndarray
+    volume: np.ndarray
+    volatility: np.ndarray
+    regime: np.ndarray  # object array of composite regime labels
+    
+    @classmethod
+    def empty(cls, T: int):
+        return cls(
+            time=np.empty(T),
+            mid_price=np.empty(T),
+            spread=np.empty(T, dtype=PATH_DTYPE),
+            bid_depth=np.empty(T, dtype=PATH_DTYPE),
+            ask_depth=np.empty(T, dtype=PATH_DTYPE),
+            volume=np.empty(T, dtype=PATH_DTYPE),
+            volatility=np.empty(T, dtype=PATH_DTYPE),
+            regime=np.empty(T, dtype=object)
+        )
+    
+    @classmethod
+    def from_states(cls, states: List[MarketState]):
+        soa = cls.empty(len(states))
+        for t, state in enumerate(states):
+            soa[t] = state
+        return soa
+    
+    @property
+    def bid(self):
+        return self.mid_price - self.spread / 2
+    
+    @property
+    def ask(self):
+        return self.mid_price + self.spread / 2
+    
+    def __len__(self):
+        return len(self.mid_price)
+    
+    def __getitem__(self, t: int) -> MarketState:
+        return MarketState(
+            time=float(self.time[t]),
+            mid_price=float(self.mid_price[t]),
+            bid=float(self.mid_price[t]) - float(self.spread[t]) / 2,
+            ask=float(self.mid_price[t]) + float(self.spread[t]) / 2,
+            bid_depth=float(self.bid_depth[t]),
+            ask_depth=float(self.ask_depth[t]),
+            volume=float(self.volume[t]),
+            volatility=float(self.volatility[t]),
+            regime=self.regime[t]
+        )
+    
+    def __setitem__(self, t: int, state: MarketState):
+        self.time[t] = state.time
+        self.mid_price[t] = state.mid_price
+        self.spread[t] = state.spread
+        self.bid_depth[t] = state.bid_depth
+        self.ask_depth[t] = state.ask_depth
+        self.volume[t] = state.volume
+        self.volatility[t] = state.volatility
+        self.regime[t] = state.regime
+
 @dataclass
 class Regime:
     volatility: str  # 'low', 'medium', 'high'
@@ -42,11 +115,17 @@ class CostBreakdown:
     def total_bps(self, notional: float):
         return (self.total / notional) * 10000 if notional > 0 else 0
 
+@dataclass
+class PathCosts:
+    # Costs of one simulated path, with the expected volume of each period it traded against
+    costs: CostBreakdown
+    volume: np.ndarray
+
 @dataclass
 class ExecutionResult:
     strategy: str
-    trajectory: List[float]
-    market_states: List[MarketState]
+    trajectory: np.ndarray
+    market_states: Optional[MarketStatesSoA]
     costs: CostBreakdown
     metrics: Dict
     simulation_id: int = 0
@@ -56,7 +135,7 @@ class ExecutionResult:
 class MonteCarloResults:
     strategy: str
     n_simulations: int
-    costs_bps: List[float]  
+    costs_bps: np.ndarray  # float32, one entry per simulation
     
     mean_cost: float
     std_cost: float
@@ -73,4 +152,5 @@ class MonteCarloResults:
     mean_opportunity: float  
     mean_adverse: float    
     
-    all_results: List[ExecutionResult]
+    trajectories: np.ndarray  # float32, shape (n_simulations, T)
+    all_results: List[ExecutionResult]  # empty unless config.retain_full_results
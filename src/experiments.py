@@ -2,7 +2,7 @@ import matplotlib.pyplot as plt
 from src.config import config
 from src.monte_carlo import MonteCarloSimulator
 from src.strategies import NaiveStrategy, TWAPStrategy, VWAPStrategy, AlmgrenChrissStrategy
-from src.analyzer import MonteCarloAnalyzer
+from src.analyzer import MonteCarloAnalyzer, INTERACTIVE
 
 def run_experiment_1_monte_carlo_validation():
     print("Experiment 1: Validation")
@@ -20,8 +20,8 @@ def run_experiment_1_monte_carlo_validation():
     def progress(msg):
         print(f"  {msg}")
     
-    mc_results = mc_sim.run_monte_carlo(strategies, config.n_simulations, 
-                                        scenario=None, progress_callback=progress)
+    mc_results = mc_sim.run_monte_carlo_vectorized(strategies, config.n_simulations, 
+                                                   scenario=None, progress_callback=progress)
     
     print("Summary:")
     summary_df = MonteCarloAnalyzer.create_summary_table(mc_results)
@@ -87,7 +87,7 @@ def run_experiment_2_stress_scenarios():
         def progress(msg):
             print(f"  {msg}")
         
-        mc_results = mc_sim.run_monte_carlo(
+        mc_results = mc_sim.run_monte_carlo_vectorized(
             strategies, 
             config.n_simulations_quick, 
             scenario=scenario_type,
@@ -157,7 +157,7 @@ def run_experiment_3_robustness_analysis():
         def progress(msg):
             print(f"  {msg}")
         
-        mc_results = mc_sim.run_monte_carlo(
+        mc_results = mc_sim.run_monte_carlo_vectorized(
             strategies,
             config.n_simulations_quick,
             scenario=None,
@@ -185,7 +185,8 @@ def run_experiment_3_robustness_analysis():
     ax.grid(alpha=0.3)
     
     plt.tight_layout()
-    plt.show()
+    if INTERACTIVE:
+        plt.show()
     plt.close(fig)
     
     print("\nExperiment 3 complete!")
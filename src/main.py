@@ -1,3 +1,5 @@
+import matplotlib.pyplot as plt
+import seaborn as sns
 from src.config import config
 from src.experiments import run_experiment_1_monte_carlo_validation, run_experiment_2_stress_scenarios, run_experiment_3_robustness_analysis
 from src.analyzer import MonteCarloAnalyzer
@@ -1,12 +1,37 @@
+import math
 import numpy as np
-from src.data_structures import MarketState
+from src.data_structures import MarketState, MarketStatesSoA, CostBreakdown, PathCosts, PATH_DTYPE
 from src.market_components import HestonVolatility, RegimeDetector
+from src._market_kernels import heston_price_step, simulate_path_kernel, simulate_path_costs_kernel
+
+SCENARIOS = {
+    'flash_crash': {
+        'type': 'flash_crash',
+        'vol_multiplier': 10.0,
+        'spread_multiplier': 5.0,
+        'volume_multiplier': 0.3,
+        'duration': 10
+    },
+    'momentum': {
+        'type': 'momentum',
+        'drift_rate': 0.0005,
+        'duration': 9999
+    },
+    'liquidity_drought': {
+        'type': 'liquidity_drought',
+        'volume_multiplier': 0.1,
+        'spread_multiplier': 2.0,
+        'duration': 30
+    },
+}
 
 class MarketSimulator:   
     def __init__(self, S0=100.0, base_vol=0.02, base_spread=0.02, base_depth=10000, 
                  base_adv=1000000, impact_gamma=0.1, impact_alpha=0.65, seed=None):
-        if seed is not None:
-            np.random.seed(seed)
+        # Accepts an int or a SeedSequence; each simulator owns its random stream
+        self.rng = np.random.default_rng(seed)
+        self._dt = 1/390
+        self._sqrt_dt = math.sqrt(self._dt)
         
         self.S0 = S0
         self.price = S0
@@ -18,6 +43,12 @@ class MarketSimulator:
         self.impact_alpha = impact_alpha
         
         self.vol_per_minute = base_vol / np.sqrt(390)
+        self._set_step_constants()
+        
+        # Intraday volume (U-shape) and spread patterns for each of the 390 minutes of the session
+        t = np.arange(390) / 390
+        self._volume_lut = self.base_adv / 390 * (1.0 + np.abs(t - 0.5))
+        self._spread_lut = self.base_spread * (1.2 - 0.4 * np.abs(t - 0.5))
         
         self.vol_model = HestonVolatility(
             v0=(self.vol_per_minute)**2,
@@ -35,15 +66,18 @@ class MarketSimulator:
         
         self.cumulative_perm_impact = 0.0
         
+    def _set_step_constants(self):
+        # Per-simulator invariants of the price step: the spread's vol scaling and the
+        # mean-reversion speed and level of the mid price
+        self._inv_vol_per_minute = 1.0 / self.vol_per_minute
+        self._kappa_p = 0.5
+        self._theta_p = self.S0
+    
     def _intraday_volume_pattern(self, minute_of_day):
-        t = minute_of_day / 390
-        u_shape = 1.0 + abs(t - 0.5)
-        return self.base_adv / 390 * u_shape
+        return self._volume_lut[minute_of_day]
     
     def _intraday_spread_pattern(self, minute_of_day):
-        t = minute_of_day / 390
-        spread_multiplier = 1.2 - 0.4 * abs(t - 0.5)
-        return self.base_spread * spread_multiplier
+        return self._spread_lut[minute_of_day]
     
     def step(self, dt=1/390, external_order_size=0) -> MarketState:
         self.current_time += dt
@@ -51,36 +85,30 @@ class MarketSimulator:
         
         expected_volume = self._intraday_volume_pattern(self.current_minute % 390)
         base_spread = self._intraday_spread_pattern(self.current_minute % 390)
-        current_vol = self.vol_model.step(dt)
         
+        vol_multiplier = 1.0
         if self.scenario and self.scenario_duration > 0:
-            current_vol *= self.scenario.get('vol_multiplier', 1.0)
+            vol_multiplier = self.scenario.get('vol_multiplier', 1.0)
             base_spread *= self.scenario.get('spread_multiplier', 1.0)
             expected_volume *= self.scenario.get('volume_multiplier', 1.0)
             self.scenario_duration -= 1
         
-        kappa = 0.5
-        theta = self.S0
-        dW = np.random.normal(0, np.sqrt(dt))
-        
-        drift = 0
+        drift_rate = 0.0
         if self.scenario and self.scenario.get('type') == 'momentum':
-            drift = self.scenario.get('drift_rate', 0) * self.price * dt
-        
-        dP = kappa * (theta - self.price) * dt + current_vol * self.price * dW + drift
-        self.price += dP
-        
-        impact = 0
-        if external_order_size != 0:
-            participation = abs(external_order_size) / max(expected_volume, 1)
-            impact = self.impact_gamma * (participation ** self.impact_alpha) * current_vol * self.price
-            self.price += np.sign(external_order_size) * impact
-        
-        spread = base_spread * (1 + 1.5 * current_vol / self.vol_per_minute)
-        if abs(external_order_size) > 0:
-            spread *= (1 + 0.5 * participation)
-        
-        depth = self.base_depth / (1 + 0.5 * abs(external_order_size) / max(expected_volume, 1))
+            drift_rate = self.scenario.get('drift_rate', 0)
+        
+        # Variance shock first, then price shock, matching the (T, 2) blocks drawn by simulate
+        sqrt_dt = self._sqrt_dt if dt == self._dt else math.sqrt(dt)
+        dW_vol = self.rng.standard_normal() * sqrt_dt
+        dW_price = self.rng.standard_normal() * sqrt_dt
+        
+        vm = self.vol_model
+        vm.v, self.price, spread, depth, current_vol = heston_price_step(
+            vm.v, self.price, vm.kappa, vm.theta, vm.sigma_v, self._kappa_p, self._theta_p,
+            self._inv_vol_per_minute, dt,
+            dW_vol, dW_price, float(external_order_size), expected_volume, base_spread, self.base_depth,
+            vol_multiplier, drift_rate, self.impact_gamma, self.impact_alpha
+        )
         
         regime = self.regime_detector.classify(current_vol, spread / self.price, expected_volume)
         
@@ -98,31 +126,113 @@ class MarketSimulator:
         
         return state
     
+    def _scenario_minutes(self, T):
+        # How many of the next T minutes the active scenario still covers
+        return min(max(self.scenario_duration, 0), T) if self.scenario else 0
+    
+    def _path_inputs(self, T):
+        # Per-minute expected volume, base spread and vol multiplier for the next T minutes,
+        # with the active scenario applied
+        minutes = (self.current_minute + np.arange(1, T + 1)) % 390
+        expected_volume = self._intraday_volume_pattern(minutes)
+        base_spread = self._intraday_spread_pattern(minutes)
+        vol_multiplier = np.ones(T)
+        
+        drift_rate = 0.0
+        if self.scenario:
+            active = self._scenario_minutes(T)
+            vol_multiplier[:active] = self.scenario.get('vol_multiplier', 1.0)
+            base_spread[:active] *= self.scenario.get('spread_multiplier', 1.0)
+            expected_volume[:active] *= self.scenario.get('volume_multiplier', 1.0)
+            if self.scenario.get('type') == 'momentum':
+                drift_rate = self.scenario.get('drift_rate', 0)
+        
+        return expected_volume, base_spread, vol_multiplier, drift_rate
+    
+    def _step_params(self, dt, drift_rate):
+        # Per-path constants of heston_price_step, in the order path_step unpacks them
+        vm = self.vol_model
+        return (float(vm.kappa), float(vm.theta), float(vm.sigma_v), float(self._kappa_p),
+                float(self._theta_p), float(self._inv_vol_per_minute), float(dt),
+                float(self.base_depth), float(drift_rate), float(self.impact_gamma),
+                float(self.impact_alpha))
+    
+    def path_kernel_inputs(self, T, dt=1/390, shocks=None):
+        # Everything the path kernels need for the next T minutes: the (T, 2) Brownian
+        # increments (drawn from self.rng unless shocks are given), the per-minute expected
+        # volume, base spread and vol multiplier, and the step_params tuple. Only the rng advances.
+        if shocks is None:
+            shocks = self.rng.standard_normal((T, 2))
+        expected_volume, base_spread, vol_multiplier, drift_rate = self._path_inputs(T)
+        return (shocks * math.sqrt(dt), expected_volume, base_spread, vol_multiplier,
+                self._step_params(dt, drift_rate))
+    
+    def _advance_clock(self, T, dt):
+        # Accumulate time the same way repeated step() calls do, and run down the scenario
+        self.scenario_duration -= self._scenario_minutes(T)
+        times = np.cumsum(np.concatenate(([self.current_time], np.full(T, dt))))[1:]
+        if T:
+            self.current_time = times[-1]
+        self.current_minute += T
+        return times
+    
+    def simulate(self, trajectory, dt=1/390, shocks=None) -> MarketStatesSoA:
+        # Same market evolution as calling step once per trajectory entry, but the minute loop
+        # runs inside simulate_path_kernel and no MarketState objects are created.
+        # shocks: (T, 2) standard normals for the variance and price increments of each minute.
+        trajectory = np.asarray(trajectory, dtype=np.float64)
+        T = len(trajectory)
+        dW, expected_volume, base_spread, vol_multiplier, step_params = self.path_kernel_inputs(T, dt, shocks)
+        
+        vm = self.vol_model
+        vm.v, self.price, mids, spreads, depths, vols = simulate_path_kernel(
+            trajectory, dW, vm.v, self.price, expected_volume, base_spread, vol_multiplier, step_params
+        )
+        
+        times = self._advance_clock(T, dt)
+        
+        regimes = np.empty(T, dtype=object)
+        for t in range(T):
+            regimes[t] = self.regime_detector.classify(
+                float(vols[t]), float(spreads[t]) / mids[t], expected_volume[t]).composite
+        
+        return MarketStatesSoA(
+            time=times,
+            mid_price=mids,
+            spread=spreads,
+            bid_depth=depths,
+            ask_depth=depths.copy(),
+            volume=expected_volume.astype(PATH_DTYPE),
+            volatility=vols,
+            regime=regimes
+        )
+    
+    def simulate_costs(self, trajectory, cost_model, arrival_price, dt=1/390, shocks=None) -> PathCosts:
+        # Evolves the market exactly like simulate() but accumulates execution costs inside the
+        # path kernel instead of returning the states. The regime detector is not updated.
+        trajectory = np.asarray(trajectory, dtype=np.float64)
+        T = len(trajectory)
+        dW, expected_volume, base_spread, vol_multiplier, step_params = self.path_kernel_inputs(T, dt, shocks)
+        
+        vm = self.vol_model
+        impact = cost_model.impact
+        vm.v, self.price, costs = simulate_path_costs_kernel(
+            trajectory, dW, vm.v, self.price, expected_volume, base_spread,
+            vol_multiplier, step_params, float(arrival_price),
+            impact.temp_gamma, impact.temp_alpha, impact.perm_eta, impact.perm_beta,
+            impact.decay_weights(T)
+        )
+        
+        self._advance_clock(T, dt)
+        
+        if trajectory.sum() == 0:
+            return PathCosts(CostBreakdown(0, 0, 0, 0, 0), expected_volume)
+        return PathCosts(CostBreakdown(*costs), expected_volume)
+    
     def inject_scenario(self, scenario_type: str):
-        if scenario_type == 'flash_crash':
-            self.scenario = {
-                'type': 'flash_crash',
-                'vol_multiplier': 10.0,
-                'spread_multiplier': 5.0,
-                'volume_multiplier': 0.3,
-                'duration': 10
-            }
-            self.scenario_duration = 10
-        elif scenario_type == 'momentum':
-            self.scenario = {
-                'type': 'momentum',
-                'drift_rate': 0.0005,
-                'duration': 9999
-            }
-            self.scenario_duration = 9999
-        elif scenario_type == 'liquidity_drought':
-            self.scenario = {
-                'type': 'liquidity_drought',
-                'volume_multiplier': 0.1,
-                'spread_multiplier': 2.0,
-                'duration': 30
-            }
-            self.scenario_duration = 30
+        if scenario_type in SCENARIOS:
+            self.scenario = dict(SCENARIOS[scenario_type])
+            self.scenario_duration = self.scenario['duration']
     
     def reset(self):
         self.price = self.S0
@@ -139,3 +249,6 @@ class MarketSimulator:
         self.scenario = None
         self.scenario_duration = 0
         self.cumulative_perm_impact = 0.0
+        self._dt = 1/390
+        self._sqrt_dt = math.sqrt(self._dt)
+        self._set_step_constants()
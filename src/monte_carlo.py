@@ -1,17 +1,54 @@
 import numpy as np
+from joblib import Parallel, delayed
 from typing import List, Dict, Optional
 from src.config import MonteCarloConfig, base_seed
 from src.data_structures import MonteCarloResults, ExecutionResult
 from src.market_simulator import MarketSimulator
+from src._market_kernels import N_STEP_PARAMS, simulate_costs_batch_kernel
 from src.impact_models import ImpactModel, CostModel
 from src.strategies import BaseStrategy
 
+# Columns are spread, temporary, permanent, opportunity, adverse selection;
+# opportunity cost is reported but is not part of the total
+_COMPONENT_IN_TOTAL = np.array([True, True, True, False, True])
+
+def _summarize(costs: np.ndarray) -> Dict:
+    # One vectorized percentile call partitions the array once for every order statistic
+    p5, median, p95 = np.percentile(costs, [5, 50, 95])
+    return {
+        'mean_cost': costs.mean(),
+        'std_cost': costs.std(),
+        'median_cost': median,
+        'percentile_5': p5,
+        'percentile_95': p95,
+        'value_at_risk_95': p95,
+    }
+
 class MonteCarloSimulator: 
     def __init__(self, config: MonteCarloConfig):
         self.config = config
+        
+        # Shared across simulations so the impact model's decay weights are computed once
+        self.cost_model = CostModel(ImpactModel(
+            temp_gamma=config.temp_gamma,
+            temp_alpha=config.temp_alpha,
+            perm_eta=config.perm_eta,
+            perm_beta=config.perm_beta,
+            temp_half_life=config.temp_impact_half_life
+        ))
     
-    def perturb_market_params(self, seed: int) -> Dict:
-        rng = np.random.RandomState(seed)
+    @staticmethod
+    def simulation_seed(simulation_id: int) -> np.random.SeedSequence:
+        # Identical to SeedSequence(base_seed).spawn(n)[simulation_id], but derivable inside any worker
+        return np.random.SeedSequence(base_seed, spawn_key=(simulation_id,))
+    
+    def perturb_market_params(self, seed) -> Dict:
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        
+        # Independent substreams for the parameter draws and the market path
+        param_seed, market_seed = seed.spawn(2)
+        rng = np.random.default_rng(param_seed)
         
         vol_mult = 1.0 + rng.uniform(-self.config.vol_perturbation, self.config.vol_perturbation)
         spread_mult = 1.0 + rng.uniform(-self.config.spread_perturbation, self.config.spread_perturbation)
@@ -25,37 +62,76 @@ class MonteCarloSimulator:
             'base_adv': self.config.base_adv,
             'impact_gamma': self.config.temp_gamma,
             'impact_alpha': self.config.temp_alpha,
-            'seed': seed
+            'seed': market_seed
         }
     
     def run_single_simulation(self, strategy: BaseStrategy, simulation_id: int,
-                             scenario: Optional[str] = None) -> ExecutionResult:
+                             scenario: Optional[str] = None,
+                             keep_states: bool = True) -> ExecutionResult:
 
-        market_params = self.perturb_market_params(base_seed + simulation_id)
+        market_params = self.perturb_market_params(self.simulation_seed(simulation_id))
         market_sim = MarketSimulator(**market_params)
         
         if scenario:
             market_sim.inject_scenario(scenario)
         
-        impact_model = ImpactModel(
-            temp_gamma=self.config.temp_gamma,
-            temp_alpha=self.config.temp_alpha,
-            perm_eta=self.config.perm_eta,
-            perm_beta=self.config.perm_beta,
-            temp_half_life=self.config.temp_impact_half_life
-        )
-        cost_model = CostModel(impact_model)
-        
         result = strategy.execute(
             total_size=self.config.order_size,
             T=self.config.execution_periods,
             market_sim=market_sim,
-            cost_model=cost_model,
-            simulation_id=simulation_id
+            cost_model=self.cost_model,
+            simulation_id=simulation_id,
+            keep_states=keep_states
         )
         
         return result
     
+    def _run_simulation_task(self, strategy: BaseStrategy, simulation_id: int,
+                             scenario: Optional[str] = None) -> ExecutionResult:
+        # Only costs and the trajectory are aggregated, so the per-period market states are
+        # only built when full results are retained
+        return self.run_single_simulation(strategy, simulation_id, scenario,
+                                          keep_states=self.config.retain_full_results)
+    
+    def _aggregate(self, strategy_name: str, components: np.ndarray, notionals: np.ndarray,
+                   trajectories: np.ndarray, all_results: List[ExecutionResult]) -> MonteCarloResults:
+        n_simulations = len(notionals)
+        
+        # Cost components in bp of notional, one row per simulation
+        components_bps = np.divide(components * 10000, notionals[:, None],
+                                   out=np.zeros_like(components), where=notionals[:, None] > 0)
+        mean_spread, mean_temp, mean_perm, mean_opp, mean_adv = components_bps.mean(axis=0)
+        
+        # Same as CostBreakdown.total_bps for every simulation at once
+        costs_array = components_bps[:, _COMPONENT_IN_TOTAL].sum(axis=1)
+        
+        return MonteCarloResults(
+            strategy=strategy_name,
+            n_simulations=n_simulations,
+            # Per-simulation costs are stored as float32; summary statistics are taken in float64
+            costs_bps=costs_array.astype(np.float32),
+            risk_adjusted_savings=0.0,
+            **_summarize(costs_array),
+            mean_spread=mean_spread,
+            mean_temp_impact=mean_temp,
+            mean_perm_impact=mean_perm,
+            mean_opportunity=mean_opp,
+            mean_adverse=mean_adv,
+            trajectories=trajectories,
+            all_results=all_results
+        )
+    
+    @staticmethod
+    def _apply_risk_adjusted_savings(results_by_strategy: Dict[str, MonteCarloResults]):
+        # Compute risk adjusted returns against TWAP benchmark
+        if 'TWAP' in results_by_strategy:
+            twap_mean = results_by_strategy['TWAP'].mean_cost
+            for name, mc_result in results_by_strategy.items():
+                if name != 'TWAP':
+                    cost_savings = twap_mean - mc_result.mean_cost
+                    if mc_result.std_cost > 0:
+                        mc_result.risk_adjusted_savings = cost_savings / mc_result.std_cost
+    
     def run_monte_carlo(self, strategies: List[BaseStrategy], n_simulations: int,
                        scenario: Optional[str] = None, 
                        progress_callback=None) -> Dict[str, MonteCarloResults]:
@@ -66,67 +142,82 @@ class MonteCarloSimulator:
             if progress_callback:
                 progress_callback(f"Running {strategy.name}...")
             
-            all_results = []
-            costs_bps = []
-            
-            for sim_id in range(n_simulations):
-                result = self.run_single_simulation(strategy, sim_id, scenario)
-                all_results.append(result)
-                
-                notional = result.arrival_price * self.config.order_size
-                costs_bps.append(result.costs.total_bps(notional))
+            # Each simulation draws from its own SeedSequence substream, so they can run in any worker
+            all_results = Parallel(n_jobs=self.config.n_jobs, backend='loky')(
+                delayed(self._run_simulation_task)(strategy, sim_id, scenario)
+                for sim_id in range(n_simulations)
+            )
+            components = np.empty((n_simulations, len(_COMPONENT_IN_TOTAL)))
+            notionals = np.empty(n_simulations)
+            trajectories = np.empty((n_simulations, self.config.execution_periods), dtype=np.float32)
             
-            costs_array = np.array(costs_bps)
+            for i, result in enumerate(all_results):
+                c = result.costs
+                components[i] = (c.spread, c.temporary, c.permanent, c.opportunity, c.adverse_selection)
+                notionals[i] = result.arrival_price * self.config.order_size
+                trajectories[i] = result.trajectory
             
-            mean_spread = np.mean([
-                (r.costs.spread / (r.arrival_price * self.config.order_size)) * 10000
-                for r in all_results
-            ])
-            mean_temp = np.mean([
-                (r.costs.temporary / (r.arrival_price * self.config.order_size)) * 10000
-                for r in all_results
-            ])
-            mean_perm = np.mean([
-                (r.costs.permanent / (r.arrival_price * self.config.order_size)) * 10000
-                for r in all_results
-            ])
-            mean_opp = np.mean([
-                (r.costs.opportunity / (r.arrival_price * self.config.order_size)) * 10000
-                for r in all_results
-            ])
-            mean_adv = np.mean([
-                (r.costs.adverse_selection / (r.arrival_price * self.config.order_size)) * 10000
-                for r in all_results
-            ])
+            results_by_strategy[strategy.name] = self._aggregate(
+                strategy.name, components, notionals, trajectories,
+                all_results if self.config.retain_full_results else []
+            )
+        
+        self._apply_risk_adjusted_savings(results_by_strategy)
+        
+        return results_by_strategy
+    
+    def run_monte_carlo_vectorized(self, strategies: List[BaseStrategy], n_simulations: int,
+                                   scenario: Optional[str] = None,
+                                   progress_callback=None) -> Dict[str, MonteCarloResults]:
+        # Costs-only counterpart of run_monte_carlo, which stays the reference driver. Each
+        # simulation's MarketSimulator is only used to set up its kernel inputs (same seed
+        # substream, perturbed parameters and scenario), and simulate_costs_batch_kernel then
+        # runs the fused path-and-cost kernel over all of them in one native call, without
+        # per-simulation ExecutionResults or joblib tasks. Costs are identical to run_monte_carlo;
+        # all_results is always empty.
+        T = self.config.execution_periods
+        dW = np.empty((n_simulations, T, 2))
+        expected_volume = np.empty((n_simulations, T))
+        base_spread = np.empty((n_simulations, T))
+        vol_multiplier = np.empty((n_simulations, T))
+        step_params = np.empty((n_simulations, N_STEP_PARAMS))
+        v = np.empty(n_simulations)
+        arrival_prices = np.empty(n_simulations)
+        
+        for i in range(n_simulations):
+            market_sim = MarketSimulator(**self.perturb_market_params(self.simulation_seed(i)))
+            if scenario:
+                market_sim.inject_scenario(scenario)
+            dW[i], expected_volume[i], base_spread[i], vol_multiplier[i], step_params[i] = \
+                market_sim.path_kernel_inputs(T)
+            v[i] = market_sim.vol_model.v
+            arrival_prices[i] = market_sim.price
+        
+        notionals = arrival_prices * self.config.order_size
+        impact = self.cost_model.impact
+        decay_weights = impact.decay_weights(T)
+        
+        results_by_strategy = {}
+        
+        for strategy in strategies:
+            if progress_callback:
+                progress_callback(f"Running {strategy.name}...")
             
-            risk_adjusted_savings = 0.0
+            trajectory = strategy.cached_trajectory(self.config.order_size, T)
+            if trajectory.sum() == 0:
+                components = np.zeros((n_simulations, len(_COMPONENT_IN_TOTAL)))
+            else:
+                components = simulate_costs_batch_kernel(
+                    trajectory, dW, v, arrival_prices, expected_volume, base_spread, vol_multiplier,
+                    step_params, arrival_prices, impact.temp_gamma, impact.temp_alpha,
+                    impact.perm_eta, impact.perm_beta, decay_weights
+                )
+            trajectories = np.tile(trajectory.astype(np.float32), (n_simulations, 1))
             
-            results_by_strategy[strategy.name] = MonteCarloResults(
-                strategy=strategy.name,
-                n_simulations=n_simulations,
-                costs_bps=costs_bps,
-                mean_cost=np.mean(costs_array),
-                std_cost=np.std(costs_array),
-                median_cost=np.median(costs_array),
-                percentile_5=np.percentile(costs_array, 5),
-                percentile_95=np.percentile(costs_array, 95),
-                risk_adjusted_savings=risk_adjusted_savings,
-                value_at_risk_95=np.percentile(costs_array, 95),
-                mean_spread=mean_spread,
-                mean_temp_impact=mean_temp,
-                mean_perm_impact=mean_perm,
-                mean_opportunity=mean_opp,
-                mean_adverse=mean_adv,
-                all_results=all_results
+            results_by_strategy[strategy.name] = self._aggregate(
+                strategy.name, components, notionals, trajectories, []
             )
         
-        # Compute risk adjusted returns against TWAP benchmark
-        if 'TWAP' in results_by_strategy:
-            twap_mean = results_by_strategy['TWAP'].mean_cost
-            for name, mc_result in results_by_strategy.items():
-                if name != 'TWAP':
-                    cost_savings = twap_mean - mc_result.mean_cost
-                    if mc_result.std_cost > 0:
-                        mc_result.risk_adjusted_savings = cost_savings / mc_result.std_cost
+        self._apply_risk_adjusted_savings(results_by_strategy)
         
         return results_by_strategy
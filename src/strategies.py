@@ -1,4 +1,5 @@
 import numpy as np
+from functools import lru_cache
 from typing import List
 from src.data_structures import MarketState, ExecutionResult
 from src.market_simulator import MarketSimulator
@@ -7,31 +8,49 @@ from src.impact_models import CostModel
 class BaseStrategy:
     def __init__(self, name: str):
         self.name = name
+        self._trajectory_cache = {}
     
     def generate_trajectory(self, total_size: float, T: int, states: List[MarketState] = None) -> List[float]:
         raise NotImplementedError
     
+    def _trajectory_key(self, total_size: float, T: int):
+        return (float(total_size), int(T))
+    
+    def cached_trajectory(self, total_size: float, T: int) -> np.ndarray:
+        # Schedules here do not depend on market states, so one read-only copy serves every simulation
+        key = self._trajectory_key(total_size, T)
+        trajectory = self._trajectory_cache.get(key)
+        if trajectory is None:
+            trajectory = np.asarray(self.generate_trajectory(total_size, T), dtype=np.float64)
+            trajectory.flags.writeable = False
+            self._trajectory_cache[key] = trajectory
+        return trajectory
+    
     def execute(self, total_size: float, T: int, market_sim: MarketSimulator, 
-                cost_model: CostModel, simulation_id: int = 0) -> ExecutionResult:
+                cost_model: CostModel, simulation_id: int = 0,
+                keep_states: bool = True) -> ExecutionResult:
         arrival_price = market_sim.price 
         
-        trajectory = self.generate_trajectory(total_size, T)
-        states = []
-        for n_t in trajectory:
-            state = market_sim.step(dt=1/390, external_order_size=n_t)
-            states.append(state)
-        
-        costs = cost_model.compute_costs(trajectory, states, arrival_price)
+        trajectory = self.cached_trajectory(total_size, T)
+        if keep_states:
+            states = market_sim.simulate(trajectory, dt=1/390)
+            costs = cost_model.compute_costs(trajectory, states, arrival_price)
+            volume = states.volume
+        else:
+            # Costs are accumulated inside the path kernel; no per-period states are kept
+            states = None
+            path = market_sim.simulate_costs(trajectory, cost_model, arrival_price, dt=1/390)
+            costs, volume = path.costs, path.volume
         
+        sizes = trajectory
+        traded = volume > 0
         notional = arrival_price * total_size
         metrics = {
             'total_cost_bps': costs.total_bps(notional),
-            'avg_participation': np.mean([
-                abs(n)/s.volume for n, s in zip(trajectory, states) if s.volume > 0
-            ]),
-            'execution_periods': len([n for n in trajectory if n != 0]),
+            'avg_participation': np.mean(np.abs(sizes[traded]) / volume[traded]),
+            'execution_periods': int(np.count_nonzero(sizes)),
             'arrival_price': arrival_price,
-            'final_price': states[-1].mid_price if states else arrival_price,
+            'final_price': market_sim.price if T else arrival_price,
         }
         
         return ExecutionResult(
@@ -66,16 +85,20 @@ class VWAPStrategy(BaseStrategy):
     def __init__(self):
         super().__init__("VWAP")
     
-    def _forecast_volume_profile(self, T):
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def _forecast_volume_profile(T):
+        # Normalized volume weights; only depend on T, so shared read-only across calls
         t = np.linspace(0, 1, T)
 
         # U-shape: high (1) at open/close, low (2) mid-day.
         u_shape = 1.0 + np.abs(t - 0.5)
-        return u_shape
+        weights = u_shape / np.sum(u_shape)
+        weights.flags.writeable = False
+        return weights
     
     def generate_trajectory(self, total_size: float, T: int, states=None) -> List[float]:
-        profile = self._forecast_volume_profile(T)
-        weights = profile / np.sum(profile)
+        weights = self._forecast_volume_profile(T)
         trajectory = (total_size * weights).tolist()
         
         # Ensure exact sum
@@ -89,28 +112,22 @@ class AlmgrenChrissStrategy(BaseStrategy):
     def __init__(self, urgency=3.0):
         super().__init__("Almgren-Chriss")
         self.urgency = urgency  # kappa * T 
+    
+    def _trajectory_key(self, total_size: float, T: int):
+        return (float(total_size), int(T), self.urgency)
         
     def generate_trajectory(self, total_size: float, T: int, states=None) -> List[float]:
 
         urgency = max(0.1, min(self.urgency, 10.0))
         kappa = urgency / T
         
-        trajectory = []
-        sinh_kappa_T = np.sinh(urgency)  
+        # Closed-form holdings X_k = X * sinh(kappa (T - k)) / sinh(kappa T); trades are the decrements
+        k = np.arange(T + 1)
+        holdings = total_size * np.sinh(kappa * (T - k)) / np.sinh(urgency)
+        trajectory = np.clip(-np.diff(holdings), 0, None)
         
-        for t in range(T):
-            if t == T - 1:
-                remaining = total_size - sum(trajectory)
-                trajectory.append(remaining)
-            else:
-                X_t = total_size * np.sinh(kappa * (T - t)) / sinh_kappa_T
-                X_t_plus_1 = total_size * np.sinh(kappa * (T - t - 1)) / sinh_kappa_T
-                
-                n_t = X_t - X_t_plus_1
-                trajectory.append(max(0, n_t))  
-        
-        actual_sum = sum(trajectory)
+        actual_sum = trajectory.sum()
         if abs(actual_sum - total_size) > 1e-6 and actual_sum > 0:
-            trajectory = [n * total_size / actual_sum for n in trajectory]
+            trajectory *= total_size / actual_sum
         
-        return trajectory
+        return trajectory.tolist()